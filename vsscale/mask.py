@@ -1,16 +1,25 @@
 from __future__ import annotations
 
-from vsexprtools import ExprOp, average_merge, norm_expr
+from vsexprtools import ExprVars, complexpr_available, norm_expr
 from vskernels import Catrom
 from vsmasktools import Morpho, XxpandMode
 from vsrgtools import box_blur, gauss_blur
-from vstools import core, get_y, iterate, shift_clip_multi, split, vs
+from vstools import core, get_y, iterate, scale_value, shift_clip_multi, split, vs
 
 __all__ = [
     'descale_detail_mask', 'descale_error_mask'
 ]
 
 
+def _xxpand_square(clip: vs.VideoNode, radius: int) -> vs.VideoNode:
+    func = Morpho.maximum if radius > 0 else Morpho.minimum
+
+    if complexpr_available:
+        return func(clip, coords=abs(radius) * 2 + 1)
+
+    return iterate(clip, core.std.Maximum if radius > 0 else core.std.Minimum, abs(radius))
+
+
 def descale_detail_mask(
     clip: vs.VideoNode, rescaled: vs.VideoNode, thr: float = 0.05,
     inflate: int = 2, xxpand: tuple[int, int] = (4, 0)
@@ -24,7 +33,7 @@ def descale_detail_mask(
     :param clip:        Original clip.
     :param rescaled:    Clip rescaled using the presumed native kernel.
     :param thr:         Binarizing threshold. Lower will catch more.
-                        Assumes float bitdepth input.
+                        Float value, scaled to the bitdepth of the input clip.
                         Default: 0.05.
     :param inflate:     Amount of times to ``inflate`` the mask. Default: 2.
     :param xxpand:      Amount of times to ``Maximum`` the clip by.
@@ -33,20 +42,20 @@ def descale_detail_mask(
 
     :return:            Mask containing all the native FHD detail.
     """
-    mask = norm_expr([get_y(clip), get_y(rescaled)], 'x y - abs')
-
-    mask = Morpho.binarize(mask, thr)
+    mask = norm_expr(
+        [get_y(clip), get_y(rescaled)], f'x y - abs {scale_value(thr, 32, clip)} >= range_max 0 ?'
+    )
 
     if xxpand[0]:
-        mask = iterate(mask, core.std.Maximum if xxpand[0] > 0 else core.std.Minimum, xxpand[0])
+        mask = _xxpand_square(mask, xxpand[0])
 
     if inflate:
         mask = iterate(mask, core.std.Inflate, inflate)
 
     if xxpand[1]:
-        mask = iterate(mask, core.std.Maximum if xxpand[1] > 0 else core.std.Minimum, xxpand[1])
+        mask = _xxpand_square(mask, xxpand[1])
 
-    return mask.std.Limiter()
+    return mask
 
 
 def descale_error_mask(
@@ -61,6 +70,8 @@ def descale_error_mask(
     :param clip:        Original clip.
     :param rescaled:    Rescaled clip.
     :param thr:         Threshold of the minimum difference.
+                        If a list, areas above the lowest threshold are kept only
+                        where connected to areas above the highest one (hysteresis).
     :param expands:     Iterations of mask expand at each step (diff, expand, binarize).
     :param blur:        How much to blur the clip. If int, it will be a box_blur, else gauss_blur.
     :param bwbias:      Calculate a bias with the clip's chroma.
@@ -72,8 +83,6 @@ def descale_error_mask(
 
     y, *chroma = split(clip)
 
-    error = norm_expr([y, rescaled], 'x y - abs')
-
     if bwbias > 1 and chroma:
         chroma_abs = norm_expr(chroma, 'x range_half - abs y range_half - abs max')
         chroma_abs = Catrom.scale(chroma_abs, y.width, y.height)
@@ -81,7 +90,9 @@ def descale_error_mask(
         bias = norm_expr([y, chroma_abs], f'x ymax >= x ymin <= or y 0 = and {bwbias} 1 ?')
         bias = Morpho.expand(bias, 2)
 
-        error = ExprOp.MUL(error, bias)
+        error = norm_expr([y, rescaled, bias], 'x y - abs z *')
+    else:
+        error = norm_expr([y, rescaled], 'x y - abs')
 
     if isinstance(expands, int):
         exp1 = exp2 = exp3 = expands
@@ -94,21 +105,31 @@ def descale_error_mask(
     if exp2:
         error = Morpho.expand(error, exp2, mode=XxpandMode.ELLIPSE)
 
-    thrs = [thr] if isinstance(thr, float) else thr
-
-    error = Morpho.binarize(error, thrs[0])
+    scaled_thrs = [scale_value(val, 32, error) for val in ([thr] if isinstance(thr, float) else thr)]
 
-    for scaled_thr in thrs[1:]:
-        bin2 = Morpho.binarize(error, scaled_thr)
-        error = bin2.misc.Hysteresis(error)
+    if len(scaled_thrs) > 1:
+        seed = error.std.Binarize(max(scaled_thrs))
+        error = seed.misc.Hysteresis(error.std.Binarize(min(scaled_thrs)))
+    else:
+        error = error.std.Binarize(scaled_thrs[0])
 
     if exp3:
-        error = Morpho.expand(error, exp2, mode=XxpandMode.ELLIPSE)
+        error = Morpho.expand(error, exp3, mode=XxpandMode.ELLIPSE)
 
     if tr > 1:
-        avg = Morpho.binarize(average_merge(*shift_clip_multi(error, (-tr, tr))), 0.5)
-
-        error = ExprOp.MIN(error, ExprOp.MAX(shift_clip_multi(ExprOp.MIN(error, avg), (-tr, tr))))
+        n_clips = tr * 2 + 1
+        clip_vars = list(ExprVars(n_clips))
+
+        avg = norm_expr(
+            shift_clip_multi(error, (-tr, tr)),
+            f'{" ".join(clip_vars)} {"+ " * (n_clips - 1)}{n_clips} / '
+            f'{scale_value(0.5, 32, error)} >= {clip_vars[tr]} 0 ?'
+        )
+
+        error = norm_expr(
+            [error, *shift_clip_multi(avg, (-tr, tr))],
+            f'{" ".join(ExprVars(n_clips + 1))} {"max " * (n_clips - 1)}min'
+        )
 
     if isinstance(blur, int):
         error = box_blur(error, blur)